@@ -1,15 +1,30 @@
 import streamlit as st
 import plotly.graph_objects as go
+import pydeck as pdk
 import pandas as pd
 import geopandas as gpd
-import random
-import json
+import numpy as np
+import math
+import os
+import contextlib
+from pathlib import Path
 
 # ============================================================================
 # KONFIGURASJON - ENDRE DENNE STIEN TIL DIN SHAPEFIL
 # ============================================================================
 SHAPEFIL_PATH = "Shape/delomrader.shp"
 NAVN_FELT = "delomraden"  # Feltet som inneholder områdenavn
+
+# Valgfritt: URL til vektorfliser (MVT) for store kartlag. Når den er satt hentes
+# polygonene som fliser i stedet for å sende hele GeoJSON-en til nettleseren.
+# Flisene lages én gang med f.eks.:
+#   ogr2ogr -f GeoJSON -t_srs EPSG:4326 delomrader.geojson Shape/delomrader.shp
+#   tippecanoe -zg -o delomrader.mbtiles --drop-densest-as-needed delomrader.geojson
+# og serveres med tileserver-gl, f.eks. "http://localhost:8080/data/delomrader/{z}/{x}/{y}.pbf"
+VEKTORFLIS_URL = None
+
+# Frø for tilfeldig generert OD-data (samme frø gir samme data)
+OD_SEED = 42
 # ============================================================================
 
 # Konfigurasjon
@@ -24,12 +39,60 @@ st.set_page_config(
 def les_shapefil(filepath):
     """Leser shapefil og returnerer GeoDataFrame"""
     try:
-        # Bruk pyogrio engine eksplisitt
-        gdf = gpd.read_file(filepath, engine='pyogrio')
-
-        # Prosjiser til WGS84 for webkart
-        if gdf.crs and gdf.crs != 'EPSG:4326':
-            gdf = gdf.to_crs('EPSG:4326')
+        # Bruk mellomlagret GeoParquet dersom den er nyere enn alle filene i shapefilen
+        # (f.eks. skriver en attributtendring i QGIS kun .dbf)
+        cache_fil = Path(filepath).with_suffix(f'.{NAVN_FELT}.parquet')
+        kildefiler = [Path(filepath).with_suffix(ext) for ext in ('.shp', '.shx', '.dbf', '.prj', '.cpg')]
+        kilde_mtime = max(f.stat().st_mtime for f in kildefiler if f.exists())
+        if cache_fil.exists() and cache_fil.stat().st_mtime >= kilde_mtime:
+            try:
+                return gpd.read_parquet(cache_fil)
+            except Exception:
+                pass  # Ødelagt mellomlager - les shapefilen på nytt under
+
+        try:
+            import pyogrio
+        except ImportError:
+            pyogrio = None
+
+        if pyogrio is not None:
+            # Les kun feltene vi trenger. Finnes ikke navn-feltet leses alle felt,
+            # så feilmeldingen viser de faktiske feltene.
+            har_navn_felt = NAVN_FELT in list(pyogrio.read_info(filepath)['fields'])
+            kolonner = [NAVN_FELT] if har_navn_felt else None
+            try:
+                # Bruk pyogrio engine eksplisitt, via Arrow
+                gdf = gpd.read_file(filepath, engine='pyogrio', use_arrow=True, columns=kolonner)
+            except (ImportError, RuntimeError):
+                # pyarrow mangler eller kan ikke brukes - les med pyogrio uten Arrow
+                gdf = gpd.read_file(filepath, engine='pyogrio', columns=kolonner)
+        else:
+            # Fall tilbake til fiona dersom pyogrio ikke er installert
+            gdf = gpd.read_file(filepath, engine='fiona')
+
+        # Prosjiser til WGS84 for webkart (hopp over om dataene allerede er i WGS84)
+        if gdf.crs is None:
+            gdf = gdf.set_crs('EPSG:4326')
+        elif gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs(4326)
+
+        # Forenkle polygonene (Douglas-Peucker) - toleranse relativt til utstrekningen
+        minx, miny, maxx, maxy = gdf.total_bounds
+        toleranse = max(maxx - minx, maxy - miny) * 1e-4
+        gdf['geometry'] = gdf.geometry.simplify(toleranse, preserve_topology=True)
+
+        # Lagre resultatet slik at neste oppstart slipper å lese shapefilen
+        # (ikke når navn-feltet mangler, da er laget feilkonfigurert)
+        # Skrives til en midlertidig fil som byttes inn, så et avbrutt skriv ikke etterlater en halv fil
+        if NAVN_FELT in gdf.columns:
+            tmp_fil = cache_fil.with_name(cache_fil.name + '.tmp')
+            try:
+                gdf.to_parquet(tmp_fil)
+                os.replace(tmp_fil, cache_fil)
+            except Exception:
+                # Mellomlagring er valgfri, f.eks. uten pyarrow eller ved skrivebeskyttet filsystem
+                with contextlib.suppress(OSError):
+                    tmp_fil.unlink(missing_ok=True)
 
         return gdf
     except Exception as e:
@@ -37,18 +100,329 @@ def les_shapefil(filepath):
         return None
 
 @st.cache_data
-def generer_tilfeldig_od_data(områder_liste):
-    """Genererer tilfeldig OD-data basert på områdeliste"""
-    od_data = {}
+def generer_tilfeldig_od_data(områder_liste, seed=OD_SEED):
+    """Genererer tilfeldig OD-matrise (rad = fra, kolonne = til) basert på områdeliste"""
+    n = len(områder_liste)
+    rng = np.random.default_rng(seed)
+
+    # Tilfeldig antall reiser mellom 300 og 3000 (får plass i int16), ingen reiser internt i et område
+    od_matrix = rng.integers(300, 3001, size=(n, n), dtype=np.int16)
+    np.fill_diagonal(od_matrix, 0)
+
+    return od_matrix
+
+
+@st.cache_data
+def beregn_od_summer(områder_key, od_seed, _od_matrix):
+    """Summerer reiser ut (rader) og inn (kolonner) for alle områder i OD-matrisen"""
+    # Summer i int32 så summene ikke flyter over int16
+    return _od_matrix.sum(axis=1, dtype=np.int32), _od_matrix.sum(axis=0, dtype=np.int32)
+
+
+# Begrens antall noder i Sankey for lesbarhet
+MAX_ANDRE_NODER = 10
+
+# Id for det klikkbare kartlaget, brukes til å lese ut valgt polygon
+KARTLAG_ID = "omrader"
+
+# Kartets størrelse i piksler (bredden er omtrent en kolonne i bredt oppsett), brukes til zoom
+KART_HOYDE = 500
+KART_BREDDE = 600
+
+
+@st.cache_resource(show_spinner=False)
+def lag_geojson(områder_key, _gdf):
+    """Konverterer GeoDataFrame til GeoJSON for kartet"""
+    return _gdf.__geo_interface__
+
+
+@st.cache_resource(show_spinner=False)
+def beregn_kartutsnitt(områder_key, _gdf):
+    """Beregner kartsenter og zoom fra utstrekningen til shapefilen"""
+    # Sentrer kart på shapefil
+    bounds = _gdf.total_bounds  # [minx, miny, maxx, maxy]
+    center_lat = (bounds[1] + bounds[3]) / 2
+    center_lon = (bounds[0] + bounds[2]) / 2
+
+    # Beregn zoom slik at utstrekningen fyller kartet. deck.gl bruker 512 px fliser, og
+    # i nord-sør-retning må utstrekningen måles i Web Mercator (strekkes mot polene).
+    def mercator_y(lat):
+        lat = math.radians(max(-85.0, min(85.0, lat)))
+        return math.log(math.tan(math.pi / 4 + lat / 2))
+
+    lon_range = max(bounds[2] - bounds[0], 1e-6)
+    y_range = max(mercator_y(bounds[3]) - mercator_y(bounds[1]), 1e-9)
+    zoom_lon = math.log2(KART_BREDDE * 360.0 / (512 * lon_range))
+    zoom_lat = math.log2(KART_HOYDE * 2 * math.pi / (512 * y_range))
+
+    # Litt luft rundt laget (~10 %)
+    zoom = max(1.0, min(18.0, min(zoom_lon, zoom_lat) - 0.15))
+
+    return center_lat, center_lon, zoom
+
+
+@st.cache_resource(show_spinner=False)
+def lag_kart(områder_key, valgt, _gdf):
+    """Lager pydeck-kart med polygoner fra shapefil, med valgt område uthevet"""
+    stil = dict(
+        id=KARTLAG_ID,
+        pickable=True,
+        auto_highlight=True,
+        filled=True,
+        stroked=True,
+        get_fill_color=[100, 149, 237, 50],
+        get_line_color=[0, 0, 255],
+        line_width_min_pixels=1
+    )
+
+    if VEKTORFLIS_URL:
+        # Alle polygoner hentes som vektorfliser, kun for synlig utsnitt og zoomnivå
+        alle_lag = pdk.Layer('MVTLayer', data=VEKTORFLIS_URL, unique_id_property=NAVN_FELT, **stil)
+        valgt_geojson = _gdf[_gdf[NAVN_FELT] == valgt].__geo_interface__
+    else:
+        # Alle polygoner i ett klikkbart lag, tegnet på GPU av deck.gl
+        geojson = lag_geojson(områder_key, _gdf)
+        alle_lag = pdk.Layer('GeoJsonLayer', data=geojson, **stil)
+        valgt_geojson = {
+            'type': 'FeatureCollection',
+            'features': [f for f in geojson['features'] if f['properties'][NAVN_FELT] == valgt]
+        }
+
+    # Valgt område tegnes oppå i eget lag
+    valgt_lag = pdk.Layer(
+        'GeoJsonLayer',
+        id="valgt",
+        data=valgt_geojson,
+        pickable=False,
+        filled=True,
+        stroked=True,
+        get_fill_color=[255, 0, 0, 100],
+        get_line_color=[255, 0, 0],
+        line_width_min_pixels=3
+    )
+
+    center_lat, center_lon, zoom = beregn_kartutsnitt(områder_key, _gdf)
+
+    return pdk.Deck(
+        layers=[alle_lag, valgt_lag],
+        initial_view_state=pdk.ViewState(latitude=center_lat, longitude=center_lon, zoom=zoom),
+        map_style=None,
+        tooltip={'html': f"<b>{{{NAVN_FELT}}}</b><br>Klikk for å velge"}
+    )
+
+
+def sankey_y_posisjoner(antall):
+    """Fordeler antall noder jevnt langs en Sankey-kolonne"""
+    if antall == 1:
+        return [0.5]
+    return np.linspace(0.05, 0.95, antall).tolist()
+
+
+@st.cache_resource(show_spinner=False)
+def lag_sankey(valgt, områder_key, od_seed, _reiser_ut, _reiser_inn):
+    """Lager Sankey-diagram for reisestrømmer til og fra valgt område"""
+    andre = [o for o in områder_key if o != valgt]
+
+    if len(andre) > MAX_ANDRE_NODER:
+        # Beskjær grafen: behold områdene med størst samlet strøm (ut + inn) mot valgt område.
+        # Kun kanter til/fra valgt område vises, så grådig utvidelse fra valgt node
+        # tilsvarer å velge de MAX_ANDRE_NODER største samlede strømmene.
+        samlet = pd.concat([
+            _reiser_ut.rename(columns={'til': 'område'}),
+            _reiser_inn.rename(columns={'fra': 'område'})
+        ]).groupby('område', observed=True)['antall'].sum()
+        andre = samlet.nlargest(MAX_ANDRE_NODER).index.tolist()
+
+    # Opprinnelser til venstre, valgt område i midten og destinasjoner til høyre,
+    # hver kolonne sortert etter antall reiser. Med faste nodeposisjoner slipper
+    # Plotly å kjøre sin egen kryssingsminimering.
+    inn = _reiser_inn[_reiser_inn['fra'].isin(andre)].sort_values('antall', ascending=False)
+    ut = _reiser_ut[_reiser_ut['til'].isin(andre)].sort_values('antall', ascending=False)
+
+    if inn.empty and ut.empty:
+        return None
+
+    valgt_idx = len(inn)
+    alle_noder = list(inn['fra']) + [valgt] + list(ut['til'])
+    node_x = [0.001] * len(inn) + [0.5] + [0.999] * len(ut)
+    node_y = sankey_y_posisjoner(len(inn)) + [0.5] + sankey_y_posisjoner(len(ut))
+
+    sources = list(range(len(inn))) + [valgt_idx] * len(ut)
+    targets = [valgt_idx] * len(inn) + list(range(valgt_idx + 1, len(alle_noder)))
+    values = inn['antall'].tolist() + ut['antall'].tolist()
+    colors = ['rgba(100, 149, 237, 0.4)'] * len(inn) + ['rgba(255, 99, 71, 0.4)'] * len(ut)
+
+    fig_sankey = go.Figure(data=[go.Sankey(
+        arrangement='fixed',
+        node=dict(
+            pad=15,
+            thickness=25,
+            line=dict(color="black", width=0.5),
+            label=alle_noder,
+            color=['#6495ED'] * len(inn) + ['#FF6347'] + ['#6495ED'] * len(ut),
+            x=node_x,
+            y=node_y
+        ),
+        link=dict(
+            source=sources,
+            target=targets,
+            value=values,
+            color=colors
+        ),
+        textfont=dict(size=14, color='black', family='Arial')
+    )])
+
+    fig_sankey.update_layout(
+        height=450,
+        font=dict(size=14, family='Arial, sans-serif'),
+        margin=dict(l=0, r=0, t=20, b=0)
+    )
 
-    for fra in områder_liste:
-        for til in områder_liste:
-            if fra != til:
-                # Tilfeldig antall reiser mellom 300 og 3000
-                antall = random.randint(300, 3000)
-                od_data[(fra, til)] = antall
+    return fig_sankey
 
-    return od_data
+
+@st.cache_resource(show_spinner=False)
+def lag_stolpediagram(områder_key, od_seed, _df_stats):
+    """Lager stolpediagram over topp 10 områder etter totalt antall reiser"""
+    top10 = _df_stats.head(10)
+
+    fig_bar = go.Figure()
+    fig_bar.add_trace(go.Bar(
+        y=top10['Område'],
+        x=top10['Reiser ut'],
+        name='Reiser ut',
+        orientation='h',
+        marker=dict(color='rgba(255, 99, 71, 0.6)')
+    ))
+    fig_bar.add_trace(go.Bar(
+        y=top10['Område'],
+        x=top10['Reiser inn'],
+        name='Reiser inn',
+        orientation='h',
+        marker=dict(color='rgba(100, 149, 237, 0.6)')
+    ))
+
+    fig_bar.update_layout(
+        barmode='group',
+        height=400,
+        xaxis_title="Antall reiser",
+        yaxis_title="",
+        yaxis={'categoryorder': 'total ascending'}
+    )
+
+    return fig_bar
+
+
+@st.cache_data
+def lag_csv(csv_key, _df):
+    """Koder tabell som CSV for nedlasting, mellomlagret per (områder, frø, område, retning)"""
+    # Andel rundes av som før; i tabellen gjøres formateringen av column_config
+    return _df.round({'andel': 1}).to_csv(index=False).encode('utf-8')
+
+
+def vis_reisestrømmer(valgt, områder_key, od_seed, total_ut, total_inn, reiser_ut, reiser_inn):
+    """Viser nøkkeltall og Sankey-diagram for valgt område"""
+    st.subheader(f"🔄 Reisestrømmer: {valgt}")
+
+    # Statistikk
+    col_a, col_b, col_c = st.columns(3)
+    col_a.metric("Reiser UT", f"{total_ut:,}")
+    col_b.metric("Reiser INN", f"{total_inn:,}")
+    col_c.metric("Netto", f"{total_inn - total_ut:+,}")
+
+    # Lag Sankey
+    fig_sankey = lag_sankey(valgt, områder_key, od_seed, reiser_ut, reiser_inn)
+
+    if fig_sankey is not None:
+        if len(områder_key) - 1 > MAX_ANDRE_NODER:
+            st.caption(f"Viser topp {MAX_ANDRE_NODER} forbindelser av {len(områder_key) - 1}")
+
+        st.plotly_chart(fig_sankey, use_container_width=True)
+    else:
+        st.info("Ingen reisestrømmer å vise")
+
+
+# Detaljene tegnes i et eget fragment, slik at interaksjon i det (f.eks. nedlasting)
+# bare kjører fragmentet på nytt og ikke bygger kartet i col1 på nytt
+@st.fragment
+def vis_detaljer(valgt, områder_key, od_seed, reiser_ut, reiser_inn, sum_ut, sum_inn):
+    """Viser detaljert oversikt over reiser for valgt område og alle områder"""
+    st.markdown("---")
+    st.subheader("📊 Detaljert oversikt")
+
+    tab1, tab2, tab3 = st.tabs(["Utgående reiser", "Innkommende reiser", "Alle områder"])
+
+    with tab1:
+        if not reiser_ut.empty:
+            df_ut = reiser_ut.sort_values('antall', ascending=False)
+            df_ut['andel'] = df_ut['antall'] / df_ut['antall'].sum() * 100
+            st.dataframe(
+                df_ut,
+                column_config={
+                    'til': 'Destinasjon',
+                    'antall': st.column_config.NumberColumn('Antall reiser', format='%d'),
+                    'andel': st.column_config.NumberColumn('Andel (%)', format='%.1f')
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+
+            # Last ned knapp
+            csv = lag_csv((områder_key, od_seed, valgt, 'ut'), df_ut)
+            st.download_button(
+                label="📥 Last ned data (CSV)",
+                data=csv,
+                file_name=f"reiser_ut_{valgt}.csv",
+                mime="text/csv"
+            )
+        else:
+            st.info("Ingen utgående reiser")
+
+    with tab2:
+        if not reiser_inn.empty:
+            df_inn = reiser_inn.sort_values('antall', ascending=False)
+            df_inn['andel'] = df_inn['antall'] / df_inn['antall'].sum() * 100
+            st.dataframe(
+                df_inn,
+                column_config={
+                    'fra': 'Opprinnelse',
+                    'antall': st.column_config.NumberColumn('Antall reiser', format='%d'),
+                    'andel': st.column_config.NumberColumn('Andel (%)', format='%.1f')
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+
+            # Last ned knapp
+            csv = lag_csv((områder_key, od_seed, valgt, 'inn'), df_inn)
+            st.download_button(
+                label="📥 Last ned data (CSV)",
+                data=csv,
+                file_name=f"reiser_inn_{valgt}.csv",
+                mime="text/csv"
+            )
+        else:
+            st.info("Ingen innkommende reiser")
+
+    with tab3:
+        # Oversikt over alle områder
+        st.markdown("**Alle delområder i datasettet:**")
+
+        df_stats = pd.DataFrame({
+            'Område': list(områder_key),
+            'Reiser ut': sum_ut,
+            'Reiser inn': sum_inn,
+            'Totalt': sum_ut + sum_inn,
+            'Netto': sum_inn - sum_ut
+        }).sort_values('Totalt', ascending=False)
+
+        st.dataframe(df_stats, use_container_width=True, hide_index=True)
+
+        # Visualiser topp 10
+        st.markdown("**Topp 10 områder etter totalt antall reiser:**")
+        fig_bar = lag_stolpediagram(områder_key, od_seed, df_stats)
+
+        st.plotly_chart(fig_bar, use_container_width=True)
 
 
 # Last shapefil
@@ -67,10 +441,16 @@ if NAVN_FELT not in gdf.columns:
 
 # Hent områder fra shapefil
 områder_liste = sorted(gdf[NAVN_FELT].unique().tolist())
+# Hashbar nøkkel for cachene (gdf er gitt av områdelisten, OD-data av områdelisten og OD_SEED)
+områder_key = tuple(områder_liste)
 st.success(f"✅ Lastet {len(områder_liste)} områder fra shapefil")
 
 # Generer tilfeldig OD-data
-od_data = generer_tilfeldig_od_data(områder_liste)
+od_matrix = generer_tilfeldig_od_data(områder_liste, seed=OD_SEED)
+område_indeks = {navn: i for i, navn in enumerate(områder_liste)}
+områder_type = pd.CategoricalDtype(områder_liste)
+antall_forbindelser = int(np.count_nonzero(od_matrix))
+sum_ut, sum_inn = beregn_od_summer(områder_key, OD_SEED, od_matrix)
 
 # === SESSION STATE ===
 if 'valgt_område' not in st.session_state:
@@ -86,7 +466,7 @@ with st.sidebar:
 
     st.subheader("📊 Data")
     st.metric("Antall områder", len(områder_liste))
-    st.metric("Antall forbindelser", len(od_data))
+    st.metric("Antall forbindelser", antall_forbindelser)
 
     st.markdown("---")
 
@@ -117,296 +497,54 @@ with col1:
     st.caption(f"Klikk på et område for å se reisestrømmer")
 
     # Lag kart med polygoner fra shapefil
-    fig_map = go.Figure()
-
-    # Legg til hver polygon
-    for idx, row in gdf.iterrows():
-        område_navn = row[NAVN_FELT]
-        er_valgt = (område_navn == st.session_state.valgt_område)
-
-        # Konverter geometri til koordinater
-        geom = row.geometry
-
-        if geom.geom_type == 'Polygon':
-            coords = [list(geom.exterior.coords)]
-        elif geom.geom_type == 'MultiPolygon':
-            coords = [list(poly.exterior.coords) for poly in geom.geoms]
-        else:
-            continue
-
-        # Tegn polygon(er)
-        for coord_ring in coords:
-            lons = [c[0] for c in coord_ring]
-            lats = [c[1] for c in coord_ring]
-
-            fig_map.add_trace(go.Scattermapbox(
-                lon=lons,
-                lat=lats,
-                mode='lines',
-                fill='toself',
-                fillcolor='rgba(255, 0, 0, 0.4)' if er_valgt else 'rgba(100, 149, 237, 0.2)',
-                line=dict(
-                    color='red' if er_valgt else 'blue',
-                    width=3 if er_valgt else 1
-                ),
-                name=område_navn,
-                text=område_navn,
-                hovertemplate=f"<b>{område_navn}</b><br>Klikk for å velge<extra></extra>",
-                customdata=[[område_navn]] * len(lons)
-            ))
-
-    # Sentrer kart på shapefil
-    bounds = gdf.total_bounds  # [minx, miny, maxx, maxy]
-    center_lat = (bounds[1] + bounds[3]) / 2
-    center_lon = (bounds[0] + bounds[2]) / 2
-
-    # Beregn zoom basert på utstrekning
-    lat_range = bounds[3] - bounds[1]
-    lon_range = bounds[2] - bounds[0]
-    max_range = max(lat_range, lon_range)
-
-    if max_range < 0.1:
-        zoom = 12
-    elif max_range < 0.5:
-        zoom = 10
-    elif max_range < 1.0:
-        zoom = 9
-    else:
-        zoom = 8
-
-    fig_map.update_layout(
-        mapbox=dict(
-            style="open-street-map",
-            center=dict(lat=center_lat, lon=center_lon),
-            zoom=zoom
-        ),
-        height=500,
-        margin=dict(l=0, r=0, t=0, b=0),
-        showlegend=False,
-        hovermode='closest'
-    )
+    kart = lag_kart(områder_key, st.session_state.valgt_område, gdf)
 
     # Vis kart med klikk-funksjonalitet
-    selected = st.plotly_chart(
-        fig_map,
+    selected = st.pydeck_chart(
+        kart,
         use_container_width=True,
+        height=KART_HOYDE,
         on_select="rerun",
-        selection_mode="points",
+        selection_mode="single-object",
         key="map"
     )
 
     # Håndter klikk på polygon
-    if selected and selected.get('selection') and selected['selection'].get('points'):
-        if len(selected['selection']['points']) > 0:
-            clicked = selected['selection']['points'][0]
-            if 'customdata' in clicked and clicked['customdata']:
-                nytt_område = clicked['customdata'][0]
-                if nytt_område != st.session_state.valgt_område:
-                    st.session_state.valgt_område = nytt_område
-                    st.rerun()
+    klikket = selected.selection.get('objects', {}).get(KARTLAG_ID, [])
+    if klikket:
+        nytt_område = klikket[0]['properties'][NAVN_FELT]
+        if nytt_område != st.session_state.valgt_område:
+            st.session_state.valgt_område = nytt_område
+            st.rerun()
+
+# Hent data for valgt område - rad i OD-matrisen er reiser ut, kolonne er reiser inn
+valgt = st.session_state.valgt_område
+i = område_indeks[valgt]
+ut_verdier = od_matrix[i]
+inn_verdier = od_matrix[:, i]
+
+# Bygg tabellene kolonnevis fra matrisen i stedet for rad for rad
+j_ut = np.nonzero(ut_verdier)[0]
+j_inn = np.nonzero(inn_verdier)[0]
+# Områdenavn lagres som kategorier (heltallskoder), antall som int32
+reiser_ut = pd.DataFrame({
+    'til': pd.Categorical.from_codes(j_ut, dtype=områder_type),
+    'antall': ut_verdier[j_ut].astype('int32')
+})
+reiser_inn = pd.DataFrame({
+    'fra': pd.Categorical.from_codes(j_inn, dtype=områder_type),
+    'antall': inn_verdier[j_inn].astype('int32')
+})
 
 with col2:
-    st.subheader(f"🔄 Reisestrømmer: {st.session_state.valgt_område}")
-
-    # Hent data for valgt område
-    reiser_ut = []
-    reiser_inn = []
-
-    for (fra, til), antall in od_data.items():
-        if fra == st.session_state.valgt_område:
-            reiser_ut.append({'til': til, 'antall': antall})
-        if til == st.session_state.valgt_område:
-            reiser_inn.append({'fra': fra, 'antall': antall})
-
-    # Statistikk
-    col_a, col_b, col_c = st.columns(3)
-    total_ut = sum([r['antall'] for r in reiser_ut])
-    total_inn = sum([r['antall'] for r in reiser_inn])
-
-    col_a.metric("Reiser UT", f"{total_ut:,}")
-    col_b.metric("Reiser INN", f"{total_inn:,}")
-    col_c.metric("Netto", f"{total_inn - total_ut:+,}")
-
-    # Lag Sankey
-    alle_noder = [st.session_state.valgt_område]
-    andre = [o for o in områder_liste if o != st.session_state.valgt_område]
-
-    # Begrens antall noder i Sankey for lesbarhet
-    MAX_ANDRE_NODER = 10
-    if len(andre) > MAX_ANDRE_NODER:
-        # Vis kun topp 10 relasjoner
-        alle_relasjoner = reiser_ut + reiser_inn
-        if alle_relasjoner:
-            df_rel = pd.DataFrame(alle_relasjoner)
-            if 'til' in df_rel.columns:
-                top_områder = df_rel.nlargest(MAX_ANDRE_NODER, 'antall')['til'].unique().tolist()
-            else:
-                top_områder = df_rel.nlargest(MAX_ANDRE_NODER, 'antall')['fra'].unique().tolist()
-            andre = [o for o in andre if o in top_områder][:MAX_ANDRE_NODER]
-
-    alle_noder.extend(andre)
-    node_dict = {node: idx for idx, node in enumerate(alle_noder)}
-
-    sources = []
-    targets = []
-    values = []
-    colors = []
-
-    for r in reiser_ut:
-        if r['til'] in node_dict:
-            sources.append(node_dict[st.session_state.valgt_område])
-            targets.append(node_dict[r['til']])
-            values.append(r['antall'])
-            colors.append('rgba(255, 99, 71, 0.4)')
-
-    for r in reiser_inn:
-        if r['fra'] in node_dict:
-            sources.append(node_dict[r['fra']])
-            targets.append(node_dict[st.session_state.valgt_område])
-            values.append(r['antall'])
-            colors.append('rgba(100, 149, 237, 0.4)')
-
-    if sources:
-        fig_sankey = go.Figure(data=[go.Sankey(
-            node=dict(
-                pad=15,
-                thickness=25,
-                line=dict(color="black", width=0.5),
-                label=alle_noder,
-                color=['#FF6347' if n == st.session_state.valgt_område else '#6495ED'
-                       for n in alle_noder]
-            ),
-            link=dict(
-                source=sources,
-                target=targets,
-                value=values,
-                color=colors
-            ),
-            textfont=dict(size=14, color='black', family='Arial')
-        )])
-
-        fig_sankey.update_layout(
-            height=450,
-            font=dict(size=14, family='Arial, sans-serif'),
-            margin=dict(l=0, r=0, t=20, b=0)
-        )
-
-        if len(andre) > MAX_ANDRE_NODER:
-            st.caption(f"Viser topp {MAX_ANDRE_NODER} forbindelser av {len(områder_liste) - 1}")
-
-        st.plotly_chart(fig_sankey, use_container_width=True)
-    else:
-        st.info("Ingen reisestrømmer å vise")
+    vis_reisestrømmer(valgt, områder_key, OD_SEED, int(sum_ut[i]), int(sum_inn[i]), reiser_ut, reiser_inn)
 
 # === DETALJERT DATA ===
-st.markdown("---")
-st.subheader("📊 Detaljert oversikt")
-
-tab1, tab2, tab3 = st.tabs(["Utgående reiser", "Innkommende reiser", "Alle områder"])
-
-with tab1:
-    if reiser_ut:
-        df_ut = pd.DataFrame(reiser_ut).sort_values('antall', ascending=False)
-        df_ut['andel'] = (df_ut['antall'] / df_ut['antall'].sum() * 100).round(1)
-        st.dataframe(
-            df_ut.rename(columns={
-                'til': 'Destinasjon',
-                'antall': 'Antall reiser',
-                'andel': 'Andel (%)'
-            }),
-            use_container_width=True,
-            hide_index=True
-        )
-
-        # Last ned knapp
-        csv = df_ut.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Last ned data (CSV)",
-            data=csv,
-            file_name=f"reiser_ut_{st.session_state.valgt_område}.csv",
-            mime="text/csv"
-        )
-    else:
-        st.info("Ingen utgående reiser")
-
-with tab2:
-    if reiser_inn:
-        df_inn = pd.DataFrame(reiser_inn).sort_values('antall', ascending=False)
-        df_inn['andel'] = (df_inn['antall'] / df_inn['antall'].sum() * 100).round(1)
-        st.dataframe(
-            df_inn.rename(columns={
-                'fra': 'Opprinnelse',
-                'antall': 'Antall reiser',
-                'andel': 'Andel (%)'
-            }),
-            use_container_width=True,
-            hide_index=True
-        )
-
-        # Last ned knapp
-        csv = df_inn.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Last ned data (CSV)",
-            data=csv,
-            file_name=f"reiser_inn_{st.session_state.valgt_område}.csv",
-            mime="text/csv"
-        )
-    else:
-        st.info("Ingen innkommende reiser")
-
-with tab3:
-    # Oversikt over alle områder
-    st.markdown("**Alle delområder i datasettet:**")
-
-    område_stats = []
-    for område in områder_liste:
-        ut = sum([v for (f, t), v in od_data.items() if f == område])
-        inn = sum([v for (f, t), v in od_data.items() if t == område])
-        område_stats.append({
-            'Område': område,
-            'Reiser ut': ut,
-            'Reiser inn': inn,
-            'Totalt': ut + inn,
-            'Netto': inn - ut
-        })
-
-    df_stats = pd.DataFrame(område_stats).sort_values('Totalt', ascending=False)
-
-    st.dataframe(df_stats, use_container_width=True, hide_index=True)
-
-    # Visualiser topp 10
-    st.markdown("**Topp 10 områder etter totalt antall reiser:**")
-    top10 = df_stats.head(10)
-
-    fig_bar = go.Figure()
-    fig_bar.add_trace(go.Bar(
-        y=top10['Område'],
-        x=top10['Reiser ut'],
-        name='Reiser ut',
-        orientation='h',
-        marker=dict(color='rgba(255, 99, 71, 0.6)')
-    ))
-    fig_bar.add_trace(go.Bar(
-        y=top10['Område'],
-        x=top10['Reiser inn'],
-        name='Reiser inn',
-        orientation='h',
-        marker=dict(color='rgba(100, 149, 237, 0.6)')
-    ))
-
-    fig_bar.update_layout(
-        barmode='group',
-        height=400,
-        xaxis_title="Antall reiser",
-        yaxis_title="",
-        yaxis={'categoryorder': 'total ascending'}
-    )
-
-    st.plotly_chart(fig_bar, use_container_width=True)
+vis_detaljer(valgt, områder_key, OD_SEED, reiser_ut, reiser_inn, sum_ut, sum_inn)
 
 # Footer
 st.markdown("---")
 st.caption(f"💡 Shapefil: {SHAPEFIL_PATH.split('/')[-1]} | "
            f"{len(områder_liste)} områder | "
-           f"{len(od_data):,} forbindelser | "
+           f"{antall_forbindelser:,} forbindelser | "
            f"Tilfeldig genererte data for demonstrasjon")
\ No newline at end of file